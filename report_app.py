@@ -1,29 +1,86 @@
+import os
+import threading
+
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from openpyxl.utils import get_column_letter
+import xlsxwriter
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Only worth JIT-compiling the reduction kernel for big shift logs
+NUMBA_MIN_ROWS = 1_000_000
+
+# Machines that appear in the report, in display order
+ALLOWED_MACHINES = [f"A{i:02d}" for i in range(1, 39)]
+
+# Report style specs, built once at import time; xlsxwriter Format objects
+# are workbook-bound, so add_report_formats registers these per workbook
+HEADER_FORMAT = {
+    'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#4F81BD',
+    'border': 1, 'align': 'center', 'valign': 'vcenter'
+}
+CELL_FORMAT = {'border': 1, 'align': 'center', 'valign': 'vcenter'}
+
+if njit is not None:
+    @njit(cache=True)
+    def machine_reductions(codes, worked, wpc, dates_ns, n_machines):
+        # Fused sum/sum/max per machine in one linear scan
+        sum_worked = np.zeros(n_machines, dtype=np.float64)
+        sum_wpc = np.zeros(n_machines, dtype=np.float64)
+        max_date = np.full(n_machines, np.int64(-2**63), dtype=np.int64)
+        counts = np.zeros(n_machines, dtype=np.int64)
+        for i in range(codes.shape[0]):
+            c = codes[i]
+            # Skip blank cells so the sums match pandas' skipna=True
+            if not np.isnan(worked[i]):
+                sum_worked[c] += worked[i]
+            if not np.isnan(wpc[i]):
+                sum_wpc[c] += wpc[i]
+            if dates_ns[i] > max_date[c]:
+                max_date[c] = dates_ns[i]
+            counts[c] += 1
+        return sum_worked, sum_wpc, max_date, counts
+
+# -----------------------------
+# Per-machine summary via the numba kernel (large inputs only)
+# -----------------------------
+def summarize_machines_numba(df_filtered):
+    categories = df_filtered["machine"].cat.categories
+    sum_worked, sum_wpc, max_date, counts = machine_reductions(
+        df_filtered["machine"].cat.codes.to_numpy(),
+        df_filtered["worked Q'ty"].to_numpy(np.float64),
+        df_filtered["WPC qty"].to_numpy(np.float64),
+        # Normalize to nanoseconds; pandas may store the column as datetime64[us]
+        df_filtered["work date"].to_numpy("datetime64[ns]").view("i8"),
+        len(categories),
+    )
+    seen = counts > 0
+    return pd.DataFrame({
+        "last_work_date": pd.to_datetime(max_date[seen]),
+        "worked Q'ty": sum_worked[seen],
+        "WPC qty": sum_wpc[seen],
+    }, index=pd.Index(categories[seen], name="machine"))
+
+# -----------------------------
+# Register the report styles once per workbook
+# -----------------------------
+def add_report_formats(wb):
+    # xlsxwriter interns each add_format() result as one shared XF record,
+    # so every styled cell references the same style index
+    return wb.add_format(HEADER_FORMAT), wb.add_format(CELL_FORMAT)
+
 # -----------------------------
 # Function to generate report
 # -----------------------------
 def generate_report(input_file, output_file):
     try:
         # -----------------------------
-        # Read input file
-        # -----------------------------
-        file_ext = input_file.split(".")[-1].lower()
-
-        if file_ext in ["xlsx", "xls"]:
-            df = pd.read_excel(input_file)
-        elif file_ext == "csv":
-            df = pd.read_csv(input_file)
-        else:
-            raise ValueError("Unsupported file format. Use CSV or Excel.")
-
-        # -----------------------------
-        # Select columns and rename
+        # Read input file (only the needed columns, with explicit dtypes)
         # -----------------------------
         column_map = {
             "Work date": "work date",
@@ -32,43 +89,65 @@ def generate_report(input_file, output_file):
             "Q`ty": "worked Q'ty",
             "WPCS Qty": "WPC qty"
         }
+        # float64 keeps fractional quantities exact in the sheet and integer
+        # sums exact past 2**24; the usecols savings are what matter here
+        dtypes = {"Machine": "category", "Shift": "category", "Q`ty": "float64", "WPCS Qty": "float64"}
+
+        file_ext = os.path.splitext(input_file)[1].lower()
+
+        if file_ext in [".xlsx", ".xls"]:
+            try:
+                # python-calamine parses the XML in Rust, much faster than openpyxl
+                df = pd.read_excel(input_file, engine="calamine",
+                                   usecols=list(column_map.keys()), dtype=dtypes)
+            except ImportError:
+                df = pd.read_excel(input_file, usecols=list(column_map.keys()), dtype=dtypes)
+        elif file_ext == ".csv":
+            df = pd.read_csv(input_file, usecols=list(column_map.keys()), dtype=dtypes,
+                             parse_dates=["Work date"])
+        else:
+            raise ValueError("Unsupported file format. Use CSV or Excel.")
 
         df_selected = df[list(column_map.keys())].rename(columns=column_map)
 
         # -----------------------------
         # Convert work date to datetime safely
         # -----------------------------
-        df_selected['work date'] = pd.to_datetime(df_selected['work date'], errors='coerce')
+        if not pd.api.types.is_datetime64_any_dtype(df_selected['work date']):
+            # An explicit format keeps the parse on the C fast path
+            parsed = pd.to_datetime(df_selected['work date'], format='%Y-%m-%d', errors='coerce')
+            if parsed.isna().all() and df_selected['work date'].notna().any():
+                # Unexpected export format; fall back to per-value inference
+                parsed = pd.to_datetime(df_selected['work date'], errors='coerce')
+            df_selected['work date'] = parsed
         df_selected = df_selected.dropna(subset=['work date'])
 
         # -----------------------------
         # Filter machines A01 to A38
         # -----------------------------
-        allowed_machines = [f"A{i:02d}" for i in range(1, 39)]
-        df_filtered = df_selected[df_selected["machine"].isin(allowed_machines)]
+        df_selected["machine"] = df_selected["machine"].astype("category").cat.set_categories(ALLOWED_MACHINES)
+        df_filtered = df_selected.dropna(subset=["machine"])
 
         # -----------------------------
-        # Find last date per machine
-        # -----------------------------
-        last_dates = df_filtered.groupby("machine")["work date"].max().reset_index()
-        last_dates.rename(columns={"work date": "last_work_date"}, inplace=True)
-
-        # -----------------------------
-        # Sum all qty per machine
-        # -----------------------------
-        sum_qty = df_filtered.groupby("machine")[["worked Q'ty", "WPC qty"]].sum().reset_index()
-
+        # Last date and qty sums per machine in one pass
         # -----------------------------
-        # Combine sum with last date
-        # -----------------------------
-        summary_df = pd.merge(last_dates, sum_qty, on="machine")
+        if njit is not None and len(df_filtered) >= NUMBA_MIN_ROWS:
+            summary_df = summarize_machines_numba(df_filtered)
+        else:
+            # Keep machine as the index; it is written out as the first column
+            summary_df = df_filtered.groupby("machine", observed=True).agg(
+                last_work_date=("work date", "max"),
+                **{"worked Q'ty": ("worked Q'ty", "sum"), "WPC qty": ("WPC qty", "sum")}
+            )
 
         # -----------------------------
         # Add WPCS % column (rounded to 2 decimals)
         # -----------------------------
-        summary_df['WPCS %'] = summary_df.apply(
-            lambda row: round((row['WPC qty'] / row["worked Q'ty"]) * 100, 2) if row["worked Q'ty"] != 0 else 0, axis=1
-        )
+        wq = summary_df["worked Q'ty"].to_numpy(np.float64)
+        wp = summary_df['WPC qty'].to_numpy(np.float64)
+        # Substitute the denominator only in the zero lanes; the result there
+        # is discarded by the outer where, this just avoids the divide warning
+        summary_df['WPCS %'] = np.round(np.where(wq != 0, wp / np.where(wq != 0, wq, 1.0) * 100, 0.0), 2)
 
         # -----------------------------
         # Remove rows where WPCS % is below 20%
@@ -76,91 +155,73 @@ def generate_report(input_file, output_file):
         summary_df = summary_df[summary_df['WPCS %'] >= 20]
 
         # -----------------------------
-        # Create total summary table
+        # Nothing above the threshold: write a minimal sheet and stop
+        # -----------------------------
+        if summary_df.empty:
+            with xlsxwriter.Workbook(output_file, {'constant_memory': True}) as wb:
+                wb.add_worksheet('Report').write(0, 0, "No machines met the 20% WPCS threshold")
+            empty_msg = f"⚠️ No machines met the 20% WPCS threshold.\nSaved to: {output_file}"
+            root.after(0, lambda: messagebox.showinfo("No data", empty_msg))
+            return
+
+        # -----------------------------
+        # Create total summary row (three scalars, no DataFrame needed)
         # -----------------------------
-        total_worked_qty = summary_df["worked Q'ty"].sum()
-        total_wpc_qty = summary_df["WPC qty"].sum()
+        total_worked_qty = float(summary_df["worked Q'ty"].sum())
+        total_wpc_qty = float(summary_df["WPC qty"].sum())
         total_wpcs_percent = round((total_wpc_qty / total_worked_qty) * 100, 2) if total_worked_qty != 0 else 0
 
-        summary_total = pd.DataFrame([{
-            "Total worked Q'ty": total_worked_qty,
-            "Total WPC qty": total_wpc_qty,
-            "Total WPCS %": total_wpcs_percent
-        }])
+        total_headers = ("Total worked Q'ty", "Total WPC qty", "Total WPCS %")
+        total_values = (total_worked_qty, total_wpc_qty, total_wpcs_percent)
 
         # -----------------------------
-        # Write both tables to a single sheet
+        # Write both tables to a single sheet. constant_memory mode streams
+        # each row to XML as it is written and then discards it, so memory
+        # stays flat no matter how large the report grows; the flip side is
+        # that rows must be written top-to-bottom and styled as they go.
         # -----------------------------
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            summary_df.to_excel(writer, sheet_name='Report', index=False, startrow=0)
+        summary_df['last_work_date'] = summary_df['last_work_date'].dt.strftime('%Y-%m-%d')
+
+        with xlsxwriter.Workbook(output_file, {'constant_memory': True}) as wb:
+            ws = wb.add_worksheet('Report')
+
+            header_fmt, cell_fmt = add_report_formats(wb)
+
+            # Auto-adjust column widths from what each dtype can render:
+            # machine codes are 3 chars, dates print as YYYY-MM-DD (10 chars),
+            # and a numeric column needs its integer digits plus decimals
+            machine_header = [summary_df.index.name, *summary_df.columns]
+            widths = {0: max(len(machine_header[0]), 3)}
+            for i, col_name in enumerate(summary_df.columns, start=1):
+                if col_name == 'last_work_date':
+                    data_length = 10
+                elif len(summary_df):
+                    data_length = len(str(int(summary_df[col_name].max()))) + 4
+                else:
+                    data_length = 0
+                widths[i] = max(data_length, len(col_name))
+            for i, (header, value) in enumerate(zip(total_headers, total_values)):
+                widths[i] = max(widths.get(i, 0), len(header), len(str(value)))
+            for i, width in widths.items():
+                ws.set_column(i, i, width + 2)
+
+            # Machine-level table (itertuples yields the machine index first)
+            ws.write_row(0, 0, machine_header, header_fmt)
+            for r, row in enumerate(summary_df.itertuples(name=None), start=1):
+                ws.write_row(r, 0, row, cell_fmt)
+
+            # Total summary table
             start_row_total = len(summary_df) + 2
-            summary_total.to_excel(writer, sheet_name='Report', index=False, startrow=start_row_total)
-
-        # -----------------------------
-        # Styling with openpyxl
-        # -----------------------------
-        wb = load_workbook(output_file)
-        ws = wb['Report']
-
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        border = Border(
-            left=Side(border_style="thin", color="000000"),
-            right=Side(border_style="thin", color="000000"),
-            top=Side(border_style="thin", color="000000"),
-            bottom=Side(border_style="thin", color="000000")
-        )
-        center_align = Alignment(horizontal="center", vertical="center")
-
-        # Auto-adjust column widths
-        for col in ws.columns:
-            max_length = 0
-            col_letter = get_column_letter(col[0].column)
-            for cell in col:
-                try:
-                    value_length = len(str(cell.value))
-                    if value_length > max_length:
-                        max_length = value_length
-                except:
-                    pass
-            ws.column_dimensions[col_letter].width = max_length + 2
-
-        # Style headers of machine-level table
-        for col in range(1, len(summary_df.columns) + 1):
-            cell = ws.cell(row=1, column=col)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_align
-            cell.border = border
-
-        # Style data of machine-level table
-        for row in ws.iter_rows(min_row=2, max_row=1 + len(summary_df), min_col=1, max_col=len(summary_df.columns)):
-            for cell in row:
-                cell.border = border
-                cell.alignment = center_align
-
-        # Style headers of total summary table
-        start_total = len(summary_df) + 3
-        for col in range(1, len(summary_total.columns) + 1):
-            cell = ws.cell(row=start_total, column=col)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_align
-            cell.border = border
-
-        # Style data of total summary table
-        for row in ws.iter_rows(min_row=start_total + 1, max_row=start_total + len(summary_total), min_col=1, max_col=len(summary_total.columns)):
-            for cell in row:
-                cell.border = border
-                cell.alignment = center_align
-
-        wb.save(output_file)
-
-        messagebox.showinfo("Success", f"✅ Excel report created successfully!\nSaved to: {output_file}")
+            ws.write_row(start_row_total, 0, total_headers, header_fmt)
+            ws.write_row(start_row_total + 1, 0, total_values, cell_fmt)
+
+        # Marshal the dialogs back onto the Tk thread
+        success_msg = f"✅ Excel report created successfully!\nSaved to: {output_file}"
+        root.after(0, lambda: messagebox.showinfo("Success", success_msg))
 
     except Exception as e:
-        messagebox.showerror("Error", f"❌ An error occurred:\n{e}")
+        error_msg = f"❌ An error occurred:\n{e}"
+        root.after(0, lambda: messagebox.showerror("Error", error_msg))
 
 # -----------------------------
 # GUI Setup
@@ -183,7 +244,8 @@ def run_report():
     if not input_file_path or not output_file_path:
         messagebox.showwarning("Warning", "Please select both input and output files.")
         return
-    generate_report(input_file_path, output_file_path)
+    # Run off the Tk thread so the window stays responsive while the report builds
+    threading.Thread(target=generate_report, args=(input_file_path, output_file_path), daemon=True).start()
 
 # GUI window
 root = tk.Tk()